@@ -1,5 +1,6 @@
 import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 from pydantic import HttpUrl
 from pydantic_settings import BaseSettings
@@ -11,30 +12,47 @@ ENVIRONMENTS = {
     "production": ".env.prod",
 }
 
-# Load environment variables from .env file based on the APP_ENV env var
-app_env = os.getenv("APP_ENV")
-env = "Unknown"
-
-# Load env file if APP_ENV is set, otherwise defaults will be loaded
-if app_env is not None:
-    if app_env not in ENVIRONMENTS.keys():
-        valid = ', '.join(ENVIRONMENTS.keys())
-        print(f"Error: Invalid or missing APP_ENV '{app_env}'. Must be one of: {valid}")
-        sys.exit(1)  # Exit with error
-    else:
-        env = ENVIRONMENTS[app_env]
-
 
 class Config(BaseSettings):
     """Application settings loaded from environment variables."""
-    env: str = env
+    env: str = "Unknown"
     ollama_url: HttpUrl = "http://localhost:11434"
     ollama_model: str = "llama3.2:1b-instruct-q2_K"
+    ollama_timeout: float = 60  # seconds
     uploads_path: Path = "uploads"
+    max_upload_size: int = 2 * 1024 * 1024 * 1024  # bytes
     chroma_db_path: Path = "chroma_db"
-
-    class Config:
-        env_file = app_env
-
-# Instantiate settings for easy access
-config = Config()
\ No newline at end of file
+    # Set to use a shared Chroma server instead of a local database,
+    # e.g. when running multiple workers
+    chroma_host: str | None = None
+    chroma_port: int = 8000
+    whisper_max_loaded_models: int = 2
+    whisper_model_ttl_seconds: int = 600
+    whisper_device: str = "cpu"
+    whisper_compute_type: str = "int8"
+    whisper_models_dir: Path = "models"
+    # Transcriptions running at once, CPU cores are split between them
+    max_concurrent_transcriptions: int = 2
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Instantiate settings on first access and reuse them afterwards."""
+    # Load environment variables from .env file based on the APP_ENV env var
+    app_env = os.getenv("APP_ENV")
+    env = "Unknown"
+    env_file = None
+
+    # Load env file if APP_ENV is set, otherwise defaults will be loaded
+    if app_env is not None:
+        if app_env not in ENVIRONMENTS.keys():
+            valid = ', '.join(ENVIRONMENTS.keys())
+            print(
+                f"Error: Invalid or missing APP_ENV '{app_env}'. Must be one of: {valid}"
+            )
+            sys.exit(1)  # Exit with error
+        else:
+            env = ENVIRONMENTS[app_env]
+            env_file = env
+
+    return Config(env=env, _env_file=env_file)
\ No newline at end of file
@@ -1,12 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.openapi.utils import get_openapi
 import os
-from pathlib import Path
 import logging
 
+from app.config import get_config
 from app.routers import transcription
+from app.services.transcription_service import TranscriptionService
 
 # Configure logging
 logging.basicConfig(
@@ -15,15 +18,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger("transcription-api")
 
-# Create uploads directory if it doesn't exist
-uploads_dir = Path("uploads")
-uploads_dir.mkdir(exist_ok=True)
+
+# Application lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared resources once at startup and reuse them across requests"""
+    import chromadb
+
+    config = get_config()
+
+    # Create data directories once at startup
+    config.uploads_path.mkdir(parents=True, exist_ok=True)
+    config.whisper_models_dir.mkdir(parents=True, exist_ok=True)
+
+    # One client per process, workers can share a Chroma server via chroma_host
+    if config.chroma_host:
+        chroma_client = chromadb.HttpClient(
+            host=config.chroma_host, port=config.chroma_port
+        )
+    else:
+        config.chroma_db_path.mkdir(parents=True, exist_ok=True)
+        chroma_client = chromadb.PersistentClient(path=str(config.chroma_db_path))
+    app.state.chroma_client = chroma_client
+
+    transcription_service = TranscriptionService(chroma_client)
+    app.state.transcription_service = transcription_service
+
+    # Unload Whisper models that have been idle longer than their TTL
+    eviction_task = asyncio.create_task(
+        transcription_service.model_manager.run_eviction()
+    )
+    try:
+        yield
+    finally:
+        eviction_task.cancel()
+
 
 # Create the FastAPI app
 app = FastAPI(
     title="Video Transcription API",
     description="An API for transcribing videos using Whisper AI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -1,22 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, Form
-import chromadb
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Form, Query, Request
 
-from app.schemas.transcription import TranscriptionRequest, TranscriptionResponse, ErrorResponse
+from app.schemas.transcription import ModelSize, TranscriptionRequest, TranscriptionResponse, ErrorResponse
 from app.services.transcription_service import TranscriptionService
-from app.config import config  # Import config
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/transcription", tags=["transcription"])
 
 
-def get_transcription_service():
-    chroma_client = chromadb.PersistentClient(path=str(config.chroma_db_path))  # Use config value
-    return TranscriptionService(chroma_client)
+def get_transcription_service(request: Request) -> TranscriptionService:
+    # The service (and its model cache) is built once in the app lifespan
+    return request.app.state.transcription_service
 
 
 @router.post(
     "/create",
     response_model=TranscriptionResponse,
-    responses={422: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+    responses={
+        413: {"model": ErrorResponse},
+        422: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
     summary="Transcribe a video file",
     description="Upload a video file and get its transcription using Whisper AI"
 )
@@ -27,13 +32,32 @@ async def create_transcript(
     try:
         result = await transcription_service.create_transcript(request.file, request.model_size)
         if not result["success"]:
+            if result.get("message") == "Invalid video file":
+                raise HTTPException(
+                    status_code=422,
+                    detail="Invalid video file"
+                )
+            elif result.get("message") == "File too large":
+                raise HTTPException(
+                    status_code=413,
+                    detail="File too large"
+                )
             raise HTTPException(
                 status_code=500,
                 detail="Failed to process video"
             )
         return TranscriptionResponse(**result)
-    except Exception as e:
-        print(f"Error processing video: {e}")
+    except HTTPException as e:
+        if e.status_code in (413, 422):
+            raise e
+        else:
+            logger.exception("Error processing video")
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to process video"
+            )
+    except Exception:
+        logger.exception("Error processing video")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process video"
@@ -63,13 +87,13 @@ async def get_transcript(
         if e.status_code == 404:
             raise e
         else:
-            print(f"Error retrieving transcript: {e}")
+            logger.exception("Error retrieving transcript")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to retrieve transcript"
             )
-    except Exception as e:
-        print(f"Error retrieving transcript: {e}")
+    except Exception:
+        logger.exception("Error retrieving transcript")
         raise HTTPException(
             status_code=500,
             detail="Failed to retrieve transcript"
@@ -84,14 +108,14 @@ async def get_transcript(
     description="Retrieve a paginated list of all transcripts"
 )
 async def list_transcripts(
-    limit: int = 10,
-    offset: int = 0,
+    limit: int = Query(10, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     transcription_service: TranscriptionService = Depends(get_transcription_service)
 ):
     try:
         return transcription_service.list_transcripts(limit, offset)
-    except Exception as e:
-        print(f"Error listing transcripts: {e}")
+    except Exception:
+        logger.exception("Error listing transcripts")
         raise HTTPException(
             status_code=500,
             detail="Failed to list transcripts"
@@ -107,11 +131,11 @@ async def list_transcripts(
 )
 async def update_transcript(
     transcript_id: str,
-    model_size: str,
+    model_size: ModelSize,
     transcription_service: TranscriptionService = Depends(get_transcription_service)
 ):
     try:
-        result = transcription_service.update_transcript(transcript_id, model_size)
+        result = await transcription_service.update_transcript(transcript_id, model_size)
         if not result["success"]:
             if result["message"] == "Transcript not found":
                 raise HTTPException(
@@ -130,13 +154,13 @@ async def update_transcript(
         if e.status_code == 404:
             raise e
         else:
-            print(f"Error updating transcript: {e}")
+            logger.exception("Error updating transcript")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to update transcript"
             )
-    except Exception as e:
-        print(f"Error updating transcript: {e}")
+    except Exception:
+        logger.exception("Error updating transcript")
         raise HTTPException(
             status_code=500,
             detail="Failed to update transcript"
@@ -166,13 +190,13 @@ async def delete_transcript(
         if e.status_code == 404:
             raise e
         else:
-            print(f"Error deleting transcript: {e}")
+            logger.exception("Error deleting transcript")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to delete transcript"
             )
-    except Exception as e:
-        print(f"Error deleting transcript: {e}")
+    except Exception:
+        logger.exception("Error deleting transcript")
         raise HTTPException(
             status_code=500,
             detail="Failed to delete transcript"
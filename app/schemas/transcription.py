@@ -1,9 +1,11 @@
 from enum import Enum
 from fastapi import File, UploadFile
-from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel, Field, field_validator
 
 
+ALLOWED_VIDEO_TYPES: frozenset[str] = frozenset({"video/mp4", "video/avi"})
+
+
 class ModelSize(str, Enum):
     tiny = "tiny"
     base = "base"
@@ -21,11 +23,9 @@ class TranscriptionRequest(BaseModel):
     
     @field_validator("file")
     def validate_file(cls, value):
-
-        allowed_types = ["video/mp4", "video/avi"]
-        print('value.content_type', value.content_type)
-        if(value.content_type not in allowed_types):
-            raise RequestValidationError(f"file must be one of: {', '.join(allowed_types)}")
+        if value.content_type not in ALLOWED_VIDEO_TYPES:
+            allowed = ', '.join(sorted(ALLOWED_VIDEO_TYPES))
+            raise ValueError(f"file must be one of: {allowed}")
         return value
 
 
@@ -1,113 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import aiofiles
+import hashlib
+import logging
 import os
+from functools import cached_property
+from typing import TYPE_CHECKING
 from fastapi import UploadFile
-import ffmpeg
-import whisper
 from pathlib import Path
-from chromadb import ClientAPI
 import uuid
-from langchain_ollama import OllamaEmbeddings
-import tempfile
-import shutil
 from app.schemas.transcription import ModelSize
-from app.config import config  # Import config
+from app.services.whisper_model_manager import WhisperModelManager
+from app.config import get_config
+
+# Heavy dependencies (faster_whisper, ffmpeg, chromadb, langchain_ollama) are
+# imported where they are used so importing the app stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    from faster_whisper import WhisperModel
+    from chromadb import ClientAPI
+    from langchain_ollama import OllamaEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Whisper expects 16 kHz mono audio
+AUDIO_SAMPLE_RATE = 16000
+
+# Bytes read from the start of an upload to check it is a video
+VIDEO_HEADER_SIZE = 4 * 1024
+
+# ISO base media (MP4) files start with one of these boxes
+MP4_BOX_TYPES = frozenset({b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide"})
+
+
+def _looks_like_video(header: bytes) -> bool:
+    """Check the file signature of an MP4 or AVI file."""
+    if header[4:8] in MP4_BOX_TYPES:
+        return True
+    return header[:4] == b"RIFF" and header[8:12] == b"AVI "
 
-print('config', config)
 
 class TranscriptionService:
-    def __init__(self, chroma_client: ClientAPI):
-        # Use config for upload directory
+    def __init__(
+        self,
+        chroma_client: ClientAPI,
+        model_manager: WhisperModelManager | None = None,
+    ):
+        config = get_config()
+
+        # Use config for upload directory, created at app startup
         self.upload_dir = config.uploads_path
-        self.upload_dir.mkdir(exist_ok=True)
+        self.max_upload_size = config.max_upload_size
 
         # Initialize ChromaDB client (persistent storage)
+        # Embeddings come from Ollama and are passed with every upsert, so
+        # Chroma's default embedding function (an ONNX model) is disabled
         self.chroma_client = chroma_client
         self.collection = self.chroma_client.get_or_create_collection(
-            name="transcripts"
+            name="transcripts", embedding_function=None
         )
 
-        # Initialize embedding model from config
-        self.embedding_model = OllamaEmbeddings(
-            base_url=config.ollama_url.unicode_string(), model=config.ollama_model
+        # Limit concurrent transcriptions and give each a share of the cores,
+        # so parallel requests don't oversubscribe the CPU; each model gets a
+        # CTranslate2 worker per slot so requests for one size run in parallel
+        max_concurrent = max(1, config.max_concurrent_transcriptions)
+        self._transcription_slots = asyncio.Semaphore(max_concurrent)
+        cpu_threads = max(1, (os.cpu_count() or 1) // max_concurrent)
+
+        # Bounded cache for loaded models, idle ones are unloaded after a TTL
+        self.model_manager = model_manager or WhisperModelManager(
+            max_loaded=config.whisper_max_loaded_models,
+            ttl_seconds=config.whisper_model_ttl_seconds,
+            device=config.whisper_device,
+            compute_type=config.whisper_compute_type,
+            download_root=str(config.whisper_models_dir),
+            cpu_threads=cpu_threads,
+            num_workers=max_concurrent,
         )
 
-        # Cache for loaded models
-        self._model_cache = {}
+    @cached_property
+    def embedding_model(self) -> OllamaEmbeddings:
+        """Embedding model from config, created on first use.
+
+        OllamaEmbeddings keeps a single httpx client, so connections to
+        Ollama are kept alive and reused across calls on this service.
+        """
+        from langchain_ollama import OllamaEmbeddings
+
+        config = get_config()
+        return OllamaEmbeddings(
+            base_url=config.ollama_url.unicode_string(),
+            model=config.ollama_model,
+            client_kwargs={"timeout": config.ollama_timeout},
+        )
 
-    def __get_model(self, model_size: str):
-        """Get or load a Whisper model of the specified size"""
-        if model_size not in self._model_cache:
-            self._model_cache[model_size] = whisper.load_model(model_size)
-        return self._model_cache[model_size]
+    def __extract_audio(self, video_path: str) -> np.ndarray | None:
+        """Extract audio from video file using ffmpeg.
+
+        The raw 16-bit PCM is read from ffmpeg's stdout and returned as a
+        float32 array in [-1, 1], which Whisper accepts directly.
+        """
+        import ffmpeg
+        import numpy as np
 
-    def __extract_audio(self, video_path: str, audio_path: str) -> bool:
-        """Extract audio from video file using ffmpeg."""
         try:
-            (
+            out, _ = (
                 ffmpeg.input(video_path)
-                .output(audio_path, acodec="pcm_s16le", ac=1, ar="16k")
-                .run(quiet=True, overwrite_output=True)
+                .output(
+                    "pipe:",
+                    format="s16le",
+                    acodec="pcm_s16le",
+                    ac=1,
+                    ar=AUDIO_SAMPLE_RATE,
+                )
+                .run(capture_stdout=True, quiet=True)
             )
-            return True
         except ffmpeg.Error as e:
-            print(f"Error extracting audio from {video_path}: {e.stderr.decode()}")
-            return False
+            logger.error(
+                "Error extracting audio from %s: %s", video_path, e.stderr.decode()
+            )
+            return None
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
 
-    def __transcribe_audio(self, audio_path: str, model: whisper.Whisper) -> str | None:
-        """Transcribe audio file using Whisper model."""
+    def __transcribe_audio(self, audio: np.ndarray, model: WhisperModel) -> str | None:
+        """Transcribe audio samples using Whisper model."""
         try:
-            result = model.transcribe(audio_path)
-            return result["text"]
-        except Exception as e:
-            print(f"Error transcribing {audio_path}: {e}")
+            # Segments are generated lazily, transcription runs while joining
+            segments, _ = model.transcribe(audio)
+            return "".join(segment.text for segment in segments)
+        except Exception:
+            logger.exception("Error transcribing audio")
             return None
 
     def __upsert_transcript(
-        self, transcript_id: str, transcript: str, video_path: str, model_size: str
+        self,
+        transcript_id: str,
+        transcript: str,
+        video_path: str,
+        model_size: str,
+        content_hash: str | None = None,
+        embedding: list[float] | None = None,
+        compare_existing: bool = False,
     ) -> bool:
         """Save transcript to ChromaDB with LLaMA embeddings and video path metadata."""
         try:
-            # Generate embedding for the transcript
-            embedding = self.embedding_model.embed_query(transcript)
+            metadata = {"video_path": video_path, "model_size": model_size}
+            if content_hash is not None:
+                metadata["content_hash"] = content_hash
+
+            if embedding is None and compare_existing:
+                # Text unchanged (e.g. re-transcribed with another model size),
+                # keep the stored embedding and only update the metadata
+                existing = self.collection.get(
+                    ids=[transcript_id], include=["documents"]
+                )
+                if existing["ids"] and existing["documents"][0] == transcript:
+                    self.collection.update(ids=[transcript_id], metadatas=[metadata])
+                    return True
+
+            if embedding is None:
+                # Generate embedding for the transcript
+                embedding = self.embedding_model.embed_query(transcript)
 
             # Store in ChromaDB with video_path as metadata
             self.collection.upsert(
                 embeddings=[embedding],
                 documents=[transcript],
-                metadatas=[{"video_path": video_path, "model_size": model_size}],
+                metadatas=[metadata],
                 ids=[transcript_id],
             )
 
             return True
-        except Exception as e:
-            print(f"Error saving transcript to ChromaDB for {video_path}: {e}")
+        except Exception:
+            logger.exception("Error saving transcript to ChromaDB for %s", video_path)
             return False
 
-    def __extract_and_transcribe_audio_and_save_transcript(
-        self, transcript_id: str, video_path: str, model_size: str
+    def __transcribe_video_and_save_transcript(
+        self,
+        transcript_id: str,
+        video_path: str,
+        model_size: str,
+        model: WhisperModel,
+        content_hash: str | None = None,
+        compare_existing: bool = False,
+    ) -> str | None:
+        """Blocking part of the pipeline: ffmpeg, Whisper and ChromaDB."""
+        # Decode the audio in memory, no intermediate WAV file
+        audio = self.__extract_audio(video_path)
+        if audio is None:
+            return None
+
+        transcript = self.__transcribe_audio(audio, model)
+
+        self.__upsert_transcript(
+            transcript_id,
+            transcript,
+            video_path,
+            model_size,
+            content_hash,
+            compare_existing=compare_existing,
+        )
+
+        return transcript
+
+    async def __extract_and_transcribe_audio_and_save_transcript(
+        self,
+        transcript_id: str,
+        video_path: str,
+        model_size: str,
+        content_hash: str | None = None,
+        compare_existing: bool = False,
     ):
         """Extract audio from video file and transcribe it using Whisper model."""
         try:
-            model = self.__get_model(model_size)
-            # Create temporary directory for audio extraction
-            with tempfile.TemporaryDirectory() as temp_dir:
-                video_name = os.path.basename(video_path)
-                video_stem = Path(video_name).stem
-
-                # Create temporary audio file
-                audio_path = os.path.join(temp_dir, f"{video_stem}.wav")
+            # Only jobs holding a slot load and pin a model, so queued jobs
+            # can't push the loaded models past the manager's limit
+            async with self._transcription_slots:
+                # Keep the model loaded (not evicted) until the transcription ends
+                async with self.model_manager.use(model_size) as model:
+                    # Run the blocking work in a thread so the event loop keeps serving
+                    return await asyncio.to_thread(
+                        self.__transcribe_video_and_save_transcript,
+                        transcript_id,
+                        video_path,
+                        model_size,
+                        model,
+                        content_hash,
+                        compare_existing,
+                    )
+        except Exception:
+            logger.exception("Error extracting and transcribing audio and saving transcript")
+            return None
 
-                if not self.__extract_audio(video_path, audio_path):
-                    return None
+    async def __save_upload(
+        self, file: UploadFile, file_path: Path, header: bytes
+    ) -> str | None:
+        """Stream the uploaded file to disk in large chunks and return its
+        content hash, or None if it exceeds the maximum upload size."""
+        content_hash = hashlib.blake2b()
+        size = 0
+        chunk = header
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk:
+                size += len(chunk)
+                if size > self.max_upload_size:
+                    break
+                content_hash.update(chunk)
+                await buffer.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+        if size > self.max_upload_size:
+            await asyncio.to_thread(file_path.unlink, missing_ok=True)
+            return None
+        return content_hash.hexdigest()
 
-                transcript = self.__transcribe_audio(audio_path, model)
+    def __find_cached_transcript(
+        self, content_hash: str, model_size: str
+    ) -> dict | None:
+        """Find a transcript of an identical video made with the same model size."""
+        try:
+            result = self.collection.get(
+                where={
+                    "$and": [
+                        {"content_hash": content_hash},
+                        {"model_size": model_size},
+                    ]
+                },
+                include=["documents", "embeddings"],
+                limit=1,
+            )
 
-                self.__upsert_transcript(
-                    transcript_id, transcript, video_path, model_size
-                )
+            if not result["ids"]:
+                return None
 
-            return transcript
-        except Exception as e:
-            print(f"Error extracting and transcribing audio and saving transcript: {e}")
+            return {
+                "transcript": result["documents"][0],
+                "embedding": result["embeddings"][0],
+            }
+        except Exception:
+            logger.exception("Error looking up cached transcript %s", content_hash)
             return None
 
     async def create_transcript(
@@ -124,31 +299,59 @@ class TranscriptionService:
         file_path = self.upload_dir / unique_filename
 
         # Save uploaded file
+        message = None
         try:
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-        except Exception as e:
-            print(f"Error saving file: {e}")
+            # Check the file looks like a video before writing anything to disk
+            header = await file.read(VIDEO_HEADER_SIZE)
+            if not _looks_like_video(header):
+                message = "Invalid video file"
+            else:
+                content_hash = await self.__save_upload(file, file_path, header)
+                if content_hash is None:
+                    message = "File too large"
+        except Exception:
+            logger.exception("Error saving file")
+            message = "Failed to save file"
+        finally:
+            # UploadFile.close runs the (possibly disk-backed) close in a thread
+            await file.close()
+
+        if message is not None:
             return {
                 "success": False,
+                "message": message,
                 "video_path": str(file_path),
                 "transcript": None,
                 "transcript_id": None,
                 "model_size": model_size,
             }
-        finally:
-            file.file.close()
 
         video_path = str(file_path)
 
-        # Extract and Transcribe audio then save transcript to ChromaDB
-        transcript = self.__extract_and_transcribe_audio_and_save_transcript(
-            transcript_id, video_path, model_size
+        # ChromaDB calls block, keep them off the event loop
+        cached = await asyncio.to_thread(
+            self.__find_cached_transcript, content_hash, model_size
         )
+        if cached:
+            # Same video was already transcribed, reuse transcript and embedding
+            transcript = cached["transcript"]
+            await asyncio.to_thread(
+                self.__upsert_transcript,
+                transcript_id,
+                transcript,
+                video_path,
+                model_size,
+                content_hash,
+                embedding=cached["embedding"],
+            )
+        else:
+            # Extract and Transcribe audio then save transcript to ChromaDB
+            transcript = await self.__extract_and_transcribe_audio_and_save_transcript(
+                transcript_id, video_path, model_size, content_hash
+            )
         if not transcript:
             # Delete the file if there's an error
-            if file_path.exists():
-                file_path.unlink()
+            await asyncio.to_thread(file_path.unlink, missing_ok=True)
             return {
                 "success": False,
                 "video_path": video_path,
@@ -165,6 +368,15 @@ class TranscriptionService:
             "model_size": model_size,
         }
 
+    def __get_metadata(self, transcript_id: str) -> dict | None:
+        """Retrieve only the metadata of a transcript, without its document."""
+        result = self.collection.get(ids=[transcript_id], include=["metadatas"])
+
+        if not result["ids"]:
+            return None
+
+        return result["metadatas"][0]
+
     def get_transcript(self, transcript_id: str) -> dict | None:
         """Retrieve a single transcript by its ID."""
         try:
@@ -180,8 +392,8 @@ class TranscriptionService:
                 "transcript": result["documents"][0],
                 "metadata": result["metadatas"][0],
             }
-        except Exception as e:
-            print(f"Error retrieving transcript {transcript_id}: {e}")
+        except Exception:
+            logger.exception("Error retrieving transcript %s", transcript_id)
             return None
 
     def list_transcripts(self, limit: int = 10, offset: int = 0) -> list[dict]:
@@ -190,17 +402,26 @@ class TranscriptionService:
             result = self.collection.get(
                 include=["documents", "metadatas"], limit=limit, offset=offset
             )
+            ids, documents, metadatas = (
+                result["ids"],
+                result["documents"],
+                result["metadatas"],
+            )
             return [
-                {"transcript_id": id_, "transcript": doc, "metadata": meta}
-                for id_, doc, meta in zip(
-                    result["ids"], result["documents"], result["metadatas"]
-                )
+                {
+                    "transcript_id": ids[i],
+                    "transcript": documents[i],
+                    "metadata": metadatas[i],
+                }
+                for i in range(len(ids))
             ]
-        except Exception as e:
-            print(f"Error listing transcripts: {e}")
+        except Exception:
+            logger.exception("Error listing transcripts")
             return []
 
-    def update_transcript(self, transcript_id: str, model_size: str) -> dict:
+    async def update_transcript(
+        self, transcript_id: str, model_size: ModelSize
+    ) -> dict:
         """Update an existing transcript with a new model size.
 
         Args:
@@ -211,18 +432,22 @@ class TranscriptionService:
             dict: A dictionary containing the success status and a message or error detail.
         """
         try:
-            # Check if transcript exists
-            existing = self.get_transcript(transcript_id)
-            if not existing:
+            # Check if transcript exists, off the event loop like create's lookup
+            metadata = await asyncio.to_thread(self.__get_metadata, transcript_id)
+            if metadata is None:
                 return {"success": False, "message": "Transcript not found"}
 
             # Check if model size is the same
-            if existing["metadata"]["model_size"] == model_size:
+            if metadata["model_size"] == model_size:
                 return {"success": False, "message": "Model size is already the same"}
 
             # Perform the update by re-transcribing the audio with the new model size
-            transcript = self.__extract_and_transcribe_audio_and_save_transcript(
-                transcript_id, existing["metadata"]["video_path"], model_size
+            transcript = await self.__extract_and_transcribe_audio_and_save_transcript(
+                transcript_id,
+                metadata["video_path"],
+                model_size,
+                metadata.get("content_hash"),
+                compare_existing=True,
             )
 
             if transcript is None:
@@ -238,7 +463,7 @@ class TranscriptionService:
                 "new_model_size": model_size,
             }
         except Exception as e:
-            print(f"Error updating transcript {transcript_id}: {e}")
+            logger.exception("Error updating transcript %s", transcript_id)
             return {
                 "success": False,
                 "message": f"Failed to update transcript: {str(e)}",
@@ -248,13 +473,12 @@ class TranscriptionService:
         """Delete a transcript by its ID."""
         try:
             # Check if transcript exists
-            existing = self.get_transcript(transcript_id)
-            if not existing:
+            if self.__get_metadata(transcript_id) is None:
                 return False
 
             self.collection.delete(ids=[transcript_id])
 
             return True
-        except Exception as e:
-            print(f"Error deleting transcript {transcript_id}: {e}")
+        except Exception:
+            logger.exception("Error deleting transcript %s", transcript_id)
             return False
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+from app.schemas.transcription import ModelSize
+
+if TYPE_CHECKING:
+    from faster_whisper import WhisperModel
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperModelManager:
+    """Keeps a bounded set of loaded faster-whisper models and unloads idle ones.
+
+    Models are kept in least-recently-used order. Loading a new size when
+    ``max_loaded`` models are already in memory unloads the oldest one, and
+    models not used for ``ttl_seconds`` are unloaded by ``evict_idle``.
+    Models handed out by ``use`` are pinned and never unloaded until the
+    block exits.
+
+    ``_lock`` only guards the bookkeeping; loading a model (which may
+    download it first) happens outside of it, behind a per-size lock so
+    concurrent requests for the same size load it once.
+
+    Only ``ModelSize`` values are accepted: faster-whisper treats any other
+    string as a Hugging Face repo id or a local path to load from.
+    """
+
+    def __init__(
+        self,
+        max_loaded: int = 2,
+        ttl_seconds: float = 600,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        download_root: str | None = None,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+    ):
+        self.max_loaded = max_loaded
+        self.ttl_seconds = ttl_seconds
+        self.device = device
+        self.compute_type = compute_type
+        self.download_root = download_root
+        # 0 lets CTranslate2 pick (all cores)
+        self.cpu_threads = cpu_threads
+        # Concurrent transcribe() calls on one model run in parallel only
+        # with that many CTranslate2 workers
+        self.num_workers = num_workers
+        # model_size -> (model, last_used)
+        self._models: OrderedDict[str, tuple[WhisperModel, float]] = OrderedDict()
+        # model_size -> number of running jobs using the model
+        self._in_use: Counter[str] = Counter()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __load(self, model_size: str) -> WhisperModel:
+        """Load a Whisper model (blocking, may download it first)."""
+        from faster_whisper import WhisperModel
+
+        logger.info("Loading Whisper model %s", model_size)
+        return WhisperModel(
+            model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            download_root=self.download_root,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers,
+        )
+
+    def __touch(self, model_size: str, pin: bool) -> WhisperModel | None:
+        """Mark a loaded model as just used. Caller must hold ``_lock``."""
+        entry = self._models.get(model_size)
+        if entry is None:
+            return None
+        self._models[model_size] = (entry[0], time.monotonic())
+        self._models.move_to_end(model_size)
+        if pin:
+            self._in_use[model_size] += 1
+        return entry[0]
+
+    def __evict_overflow(self):
+        """Unload least recently used models beyond the limit, skipping
+        pinned ones. Caller must hold ``_lock``."""
+        for model_size in list(self._models):
+            if len(self._models) <= self.max_loaded:
+                break
+            if not self._in_use[model_size]:
+                del self._models[model_size]
+
+    def __get(self, model_size: str, pin: bool) -> WhisperModel:
+        model_size = ModelSize(model_size).value  # ValueError on unknown sizes
+        with self._lock:
+            model = self.__touch(model_size, pin)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(model_size, threading.Lock())
+
+        with load_lock:
+            # Another request may have loaded it while we waited
+            with self._lock:
+                model = self.__touch(model_size, pin)
+                if model is not None:
+                    return model
+
+            model = self.__load(model_size)
+
+            with self._lock:
+                self._models[model_size] = (model, time.monotonic())
+                if pin:
+                    self._in_use[model_size] += 1
+                self.__evict_overflow()
+            return model
+
+    def get(self, model_size: str) -> WhisperModel:
+        """Get or load a Whisper model of the specified size (blocking)"""
+        return self.__get(model_size, pin=False)
+
+    def release(self, model_size: str):
+        """Unpin a model handed out by ``use`` and restart its TTL."""
+        with self._lock:
+            self._in_use[model_size] -= 1
+            if self._in_use[model_size] <= 0:
+                del self._in_use[model_size]
+            self.__touch(model_size, pin=False)
+            self.__evict_overflow()
+
+    @asynccontextmanager
+    async def use(self, model_size: str) -> AsyncIterator[WhisperModel]:
+        """Get or load a model without blocking the event loop, and keep it
+        loaded until the block exits."""
+        model_size = ModelSize(model_size).value
+        model = await asyncio.to_thread(self.__get, model_size, True)
+        try:
+            yield model
+        finally:
+            self.release(model_size)
+
+    def evict_idle(self) -> list[str]:
+        """Unload models that have not been used within the TTL."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                model_size
+                for model_size, (_, last_used) in self._models.items()
+                if now - last_used > self.ttl_seconds and not self._in_use[model_size]
+            ]
+            for model_size in expired:
+                del self._models[model_size]
+        if expired:
+            logger.info("Unloaded idle Whisper models: %s", ", ".join(expired))
+        return expired
+
+    async def run_eviction(self, interval_seconds: float = 60):
+        """Periodically unload idle models until cancelled."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(self.evict_idle)
@@ -1,22 +1,32 @@
 import asyncio
 from io import BytesIO
+import sys
+import time
+import types
 import unittest
+from unittest import mock
 import chromadb
 import os
 import shutil
 from fastapi import UploadFile
 
+from app.schemas.transcription import ModelSize
 from app.services.transcription_service import TranscriptionService
-from app.config import config
+from app.services.whisper_model_manager import WhisperModelManager
+from app.config import get_config
 
 
 class TestTranscriptionService(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         cls.dir_path = os.path.dirname(os.path.realpath(__file__))
+        # The app creates the uploads directory at startup
+        get_config().uploads_path.mkdir(parents=True, exist_ok=True)
         cls.client = chromadb.Client()
         cls.transcription_service = TranscriptionService(cls.client)
-        cls.collection = cls.client.get_or_create_collection(name="transcripts")
+        cls.collection = cls.client.get_or_create_collection(
+            name="transcripts", embedding_function=None
+        )
         cls.video_path = os.path.join(
             cls.dir_path, "videos", "kennedy-inaugural-excerpt.mp4"
         )
@@ -25,6 +35,7 @@ class TestTranscriptionService(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         # Clean up test uploads directory
+        config = get_config()
         if config.uploads_path.exists():
             shutil.rmtree(config.uploads_path)
 
@@ -35,7 +46,7 @@ class TestTranscriptionService(unittest.TestCase):
         self.collection.delete(where={"id": {"$ne": ""}})  # Delete all records
 
         # Clean up any files created during the test
-        for file in config.uploads_path.glob("*"):
+        for file in get_config().uploads_path.glob("*"):
             if file.is_file():
                 file.unlink()
 
@@ -104,6 +115,48 @@ class TestTranscriptionService(unittest.TestCase):
         self.assertEqual(result["model_size"], model_size)
         self.assertIsNone(result["transcript"])
         self.assertIsNone(result["transcript_id"])
+        self.assertEqual(result["message"], "Invalid video file")
+        # The upload is rejected before anything is written to disk
+        self.assertFalse(os.path.exists(result["video_path"]))
+
+    def test_create_transcript_too_large_removes_partial_file(self):
+        model_size = "tiny"
+        transcription_service = TranscriptionService(self.client)
+        # Smaller than the video, the upload is cut off after the first chunk
+        transcription_service.max_upload_size = 4096
+
+        result = asyncio.run(
+            transcription_service.create_transcript(self.video_file, model_size)
+        )
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["message"], "File too large")
+        self.assertIsNone(result["transcript_id"])
+        self.assertFalse(os.path.exists(result["video_path"]))
+        self.assertEqual(self.collection.count(), 0)
+
+    def test_create_transcript_same_video_reuses_transcript(self):
+        model_size = "tiny"
+        result_1 = asyncio.run(
+            self.transcription_service.create_transcript(self.video_file, model_size)
+        )
+        # Create a new video file since the previous one is closed
+        self.create_upload_file()
+        result_2 = asyncio.run(
+            self.transcription_service.create_transcript(self.video_file, model_size)
+        )
+
+        self.assertTrue(result_2["success"])
+        self.assertNotEqual(result_1["transcript_id"], result_2["transcript_id"])
+        self.assertEqual(result_1["transcript"], result_2["transcript"])
+
+        # Both entries are stored with the same content hash
+        items = self.collection.get(
+            ids=[result_1["transcript_id"], result_2["transcript_id"]],
+            include=["metadatas"],
+        )
+        content_hashes = {meta["content_hash"] for meta in items["metadatas"]}
+        self.assertEqual(len(content_hashes), 1)
 
     # Get transcript
     def test_get_transcript_success(self):
@@ -175,8 +228,8 @@ class TestTranscriptionService(unittest.TestCase):
 
         transcript_id = create_result["transcript_id"]
         new_model_size = "base"
-        result = self.transcription_service.update_transcript(
-            transcript_id, new_model_size
+        result = asyncio.run(
+            self.transcription_service.update_transcript(transcript_id, new_model_size)
         )
         self.assertTrue(result["success"])
 
@@ -187,8 +240,8 @@ class TestTranscriptionService(unittest.TestCase):
     def test_update_transcript_failure_nonexistent(self):
         transcript_id = "nonexistent_id"
         new_model_size = "base"
-        result = self.transcription_service.update_transcript(
-            transcript_id, new_model_size
+        result = asyncio.run(
+            self.transcription_service.update_transcript(transcript_id, new_model_size)
         )
         self.assertFalse(result["success"])
         self.assertEqual(result["message"], "Transcript not found")
@@ -200,7 +253,9 @@ class TestTranscriptionService(unittest.TestCase):
         )
 
         transcript_id = create_result["transcript_id"]
-        result = self.transcription_service.update_transcript(transcript_id, model_size)
+        result = asyncio.run(
+            self.transcription_service.update_transcript(transcript_id, model_size)
+        )
         self.assertFalse(result["success"])
         self.assertEqual(result["message"], "Model size is already the same")
 
@@ -223,3 +278,94 @@ class TestTranscriptionService(unittest.TestCase):
         transcript_id = "nonexistent_id"
         result = self.transcription_service.delete_transcript(transcript_id)
         self.assertFalse(result)
+
+
+class FakeWhisperModel:
+    """Stands in for faster_whisper.WhisperModel, no weights are loaded."""
+
+    def __init__(self, model_size, **kwargs):
+        self.model_size = model_size
+
+
+class TestTranscriptionServiceModelLimit(unittest.TestCase):
+    def setUp(self):
+        fake_faster_whisper = types.ModuleType("faster_whisper")
+        fake_faster_whisper.WhisperModel = FakeWhisperModel
+        modules = mock.patch.dict(sys.modules, {"faster_whisper": fake_faster_whisper})
+        modules.start()
+        self.addCleanup(modules.stop)
+
+        # Every transcript exists and was made with a size not among ModelSize
+        chroma_client = mock.MagicMock()
+        chroma_client.get_or_create_collection.return_value.get.return_value = {
+            "ids": ["id"],
+            "metadatas": [{"video_path": "video.mp4", "model_size": "none"}],
+        }
+        # One loaded model per transcription slot
+        self.max_loaded = get_config().max_concurrent_transcriptions
+        self.model_manager = WhisperModelManager(max_loaded=self.max_loaded)
+        self.transcription_service = TranscriptionService(
+            chroma_client, model_manager=self.model_manager
+        )
+
+        # Replace ffmpeg, Whisper and ChromaDB, recording the loaded models
+        # and the pins held while transcribing
+        self.loaded_counts = []
+        self.pins = []
+        self.transcribe_error = None
+
+        def transcribe(transcript_id, video_path, model_size, model, *args):
+            self.loaded_counts.append(len(self.model_manager._models))
+            self.pins.append(self.model_manager._in_use[model_size])
+            if self.transcribe_error is not None:
+                raise self.transcribe_error
+            time.sleep(0.05)
+            return f"transcript {model_size}"
+
+        blocking_part = mock.patch.object(
+            self.transcription_service,
+            "_TranscriptionService__transcribe_video_and_save_transcript",
+            side_effect=transcribe,
+        )
+        blocking_part.start()
+        self.addCleanup(blocking_part.stop)
+
+    def test_queued_updates_stay_within_loaded_model_limit(self):
+        async def update_all():
+            return await asyncio.gather(
+                *(
+                    self.transcription_service.update_transcript(
+                        f"id-{model_size.value}", model_size
+                    )
+                    for model_size in ModelSize
+                )
+            )
+
+        results = asyncio.run(update_all())
+
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(len(self.loaded_counts), len(ModelSize))
+        self.assertLessEqual(max(self.loaded_counts), self.max_loaded)
+
+    def test_model_is_pinned_while_transcribing_and_released_after(self):
+        result = asyncio.run(
+            self.transcription_service.update_transcript("id", ModelSize.tiny)
+        )
+
+        self.assertTrue(result["success"])
+        self.assertEqual(self.pins, [1])
+        self.assertEqual(self.model_manager._in_use, {})
+        # Released, so it is unloaded once its TTL expires
+        self.model_manager.ttl_seconds = -1
+        self.assertEqual(self.model_manager.evict_idle(), ["tiny"])
+
+    def test_model_is_released_when_transcription_fails(self):
+        self.transcribe_error = RuntimeError("transcription failed")
+
+        result = asyncio.run(
+            self.transcription_service.update_transcript("id", ModelSize.tiny)
+        )
+
+        self.assertFalse(result["success"])
+        self.assertEqual(self.pins, [1])
+        self.assertEqual(self.model_manager._in_use, {})
@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+from app.services.whisper_model_manager import WhisperModelManager
+
+
+class FakeWhisperModel:
+    """Stands in for faster_whisper.WhisperModel, loading blocks on sizes
+    listed in ``blocked`` until ``release_load`` is set. ``loading`` is set
+    once a blocked load has started."""
+
+    loads = []
+    blocked = set()
+    loading = threading.Event()
+    release_load = threading.Event()
+
+    def __init__(self, model_size, **kwargs):
+        FakeWhisperModel.loads.append(model_size)
+        if model_size in FakeWhisperModel.blocked:
+            FakeWhisperModel.loading.set()
+            FakeWhisperModel.release_load.wait(timeout=5)
+        self.model_size = model_size
+        self.kwargs = kwargs
+
+
+class TestWhisperModelManager(unittest.TestCase):
+    def setUp(self):
+        FakeWhisperModel.loads = []
+        FakeWhisperModel.blocked = set()
+        FakeWhisperModel.loading = threading.Event()
+        FakeWhisperModel.release_load = threading.Event()
+
+        fake_faster_whisper = types.ModuleType("faster_whisper")
+        fake_faster_whisper.WhisperModel = FakeWhisperModel
+        modules = mock.patch.dict(sys.modules, {"faster_whisper": fake_faster_whisper})
+        modules.start()
+        self.addCleanup(modules.stop)
+
+        # Controllable clock for the TTL
+        self.now = 0.0
+        clock = mock.patch("app.services.whisper_model_manager.time")
+        clock.start().monotonic.side_effect = lambda: self.now
+        self.addCleanup(clock.stop)
+
+    def test_get_reuses_loaded_model(self):
+        manager = WhisperModelManager()
+        model = manager.get("tiny")
+        self.assertIs(manager.get("tiny"), model)
+        self.assertEqual(FakeWhisperModel.loads, ["tiny"])
+
+    def test_unknown_model_size_is_rejected(self):
+        manager = WhisperModelManager()
+        with self.assertRaises(ValueError):
+            manager.get("someone/some-model")
+        self.assertEqual(FakeWhisperModel.loads, [])
+        self.assertEqual(manager._load_locks, {})
+
+    def test_model_options_are_passed_to_whisper_model(self):
+        manager = WhisperModelManager(cpu_threads=4, num_workers=2)
+        model = manager.get("tiny")
+        self.assertEqual(model.kwargs["cpu_threads"], 4)
+        self.assertEqual(model.kwargs["num_workers"], 2)
+
+    def test_lru_overflow_unloads_least_recently_used(self):
+        manager = WhisperModelManager(max_loaded=2)
+        tiny = manager.get("tiny")
+        base = manager.get("base")
+        manager.get("tiny")  # base is now the least recently used
+        manager.get("small")
+
+        self.assertIs(manager.get("tiny"), tiny)
+        self.assertIsNot(manager.get("base"), base)
+        self.assertEqual(FakeWhisperModel.loads, ["tiny", "base", "small", "base"])
+
+    def test_evict_idle_unloads_expired_models(self):
+        manager = WhisperModelManager(ttl_seconds=10)
+        manager.get("tiny")
+        self.now = 5
+        manager.get("base")
+
+        self.now = 12
+        self.assertEqual(manager.evict_idle(), ["tiny"])
+        self.now = 16
+        self.assertEqual(manager.evict_idle(), ["base"])
+        self.assertEqual(manager.evict_idle(), [])
+
+    def test_model_in_use_is_not_evicted(self):
+        manager = WhisperModelManager(max_loaded=1, ttl_seconds=10)
+
+        async def transcribe():
+            async with manager.use("tiny") as model:
+                # Longer than the TTL, and another size overflows the limit
+                self.now = 100
+                self.assertEqual(manager.evict_idle(), [])
+                manager.get("base")
+                self.assertIs(manager.get("tiny"), model)
+            return model
+
+        model = asyncio.run(transcribe())
+
+        # The TTL restarts when the job releases the model
+        self.now = 105
+        self.assertEqual(manager.evict_idle(), [])
+        self.assertIs(manager.get("tiny"), model)
+        self.assertEqual(FakeWhisperModel.loads, ["tiny", "base"])
+
+    def test_loading_does_not_block_other_sizes_or_eviction(self):
+        manager = WhisperModelManager(max_loaded=3)
+        tiny = manager.get("tiny")
+        FakeWhisperModel.blocked = {"large"}
+
+        loader = threading.Thread(target=manager.get, args=("large",))
+        loader.start()
+        try:
+            # Wait for the slow load to start
+            self.assertTrue(FakeWhisperModel.loading.wait(timeout=5))
+
+            self.assertIs(manager.get("tiny"), tiny)
+            self.assertEqual(manager.evict_idle(), [])
+        finally:
+            FakeWhisperModel.release_load.set()
+            loader.join(timeout=5)
+
+    def test_concurrent_requests_load_a_size_once(self):
+        manager = WhisperModelManager()
+        FakeWhisperModel.blocked = {"base"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(manager.get("base")))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self.assertTrue(FakeWhisperModel.loading.wait(timeout=5))
+        finally:
+            FakeWhisperModel.release_load.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(FakeWhisperModel.loads, ["base"])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(model is results[0] for model in results))
@@ -2,10 +2,33 @@
 """
 Test script to verify that all dependencies are correctly installed.
 """
+import argparse
+import ctypes
+import json
+import os
+import shutil
 import sys
 import subprocess
 import importlib
+import importlib.util
 import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+# Distribution names of packages whose import name differs
+DISTRIBUTION_NAMES = {
+    "ffmpeg": "ffmpeg-python",
+    "faster_whisper": "faster-whisper",
+}
+
+# Parsed `ffmpeg -version` output, keyed by the binary's path and mtime
+FFMPEG_PROBE_CACHE = Path.home() / ".cache" / "transcribe-videos" / "ffmpeg_probe.json"
+
+# Each check returns (label, ok, message) so checks can run in parallel
+# and their output is still printed in a fixed order
 
 def check_python_version():
     """Check if Python version is 3.8 or higher."""
@@ -13,100 +36,298 @@ def check_python_version():
     current_version = sys.version_info
     
     if current_version >= required_version:
-        print(f"✓ Python version: {sys.version}")
-        return True
+        return "python", True, f"✓ Python version: {sys.version}"
     else:
-        print(f"✗ Python version: {sys.version}")
-        print(f"  Required: Python {required_version[0]}.{required_version[1]} or higher")
-        return False
+        return "python", False, (
+            f"✗ Python version: {sys.version}\n"
+            f"  Required: Python {required_version[0]}.{required_version[1]} or higher"
+        )
+
+def read_ffmpeg_probe_cache(key):
+    """Return the cached FFmpeg version line for this binary, if any."""
+    try:
+        return json.loads(FFMPEG_PROBE_CACHE.read_text()).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def write_ffmpeg_probe_cache(key, version_line):
+    """Atomically store the FFmpeg version line for this binary."""
+    try:
+        FFMPEG_PROBE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = FFMPEG_PROBE_CACHE.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({key: version_line}))
+        os.replace(tmp_path, FFMPEG_PROBE_CACHE)
+    except OSError:
+        pass  # The cache is only an optimization
+
+@lru_cache(maxsize=1)
+def find_ffmpeg():
+    """Search PATH for ffmpeg once and reuse the absolute path."""
+    return shutil.which("ffmpeg")
 
 def check_ffmpeg():
     """Check if FFmpeg is installed and accessible."""
+    path = find_ffmpeg()
+    if path is None:
+        return "ffmpeg", False, "✗ FFmpeg: Not found in PATH"
+
+    # Skip spawning ffmpeg if this exact binary was probed before
+    cache_key = f"{path}:{os.stat(path).st_mtime_ns}"
+    version_line = read_ffmpeg_probe_cache(cache_key)
+    if version_line is not None:
+        return "ffmpeg", True, f"✓ FFmpeg: {version_line}"
+
     try:
-        result = subprocess.run(
-            ["ffmpeg", "-version"], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True
+        # Only the first stdout line is needed, the build banner on stderr
+        # is discarded instead of being captured and decoded
+        # Spawn the resolved path so PATH (and PATHEXT) isn't searched again
+        proc = subprocess.Popen(
+            [path, "-version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
         )
-        if result.returncode == 0:
-            version_line = result.stdout.split('\n')[0]
-            print(f"✓ FFmpeg: {version_line}")
-            return True
-        else:
-            print("✗ FFmpeg: Not found or not working properly")
-            return False
     except FileNotFoundError:
-        print("✗ FFmpeg: Not found in PATH")
-        return False
+        return "ffmpeg", False, "✗ FFmpeg: Not found in PATH"
+
+    with proc:
+        version_line = proc.stdout.readline().decode("ascii", "replace").rstrip()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    if proc.returncode == 0:
+        write_ffmpeg_probe_cache(cache_key, version_line)
+        return "ffmpeg", True, f"✓ FFmpeg: {version_line}"
+    else:
+        return "ffmpeg", False, "✗ FFmpeg: Not found or not working properly"
 
 def check_package(package_name):
-    """Check if a Python package is installed."""
+    """Check if a Python package is installed.
+
+    The installed distribution metadata is read first, which gives the
+    version without importing or even locating the package. The import
+    system is only searched when there is no metadata (e.g. an editable
+    install without PKG-INFO), and the package is never imported.
+    """
     try:
-        module = importlib.import_module(package_name)
-        if hasattr(module, '__version__'):
-            version = module.__version__
-        else:
-            version = "Unknown version"
-        print(f"✓ {package_name}: {version}")
-        return True
-    except ImportError:
-        print(f"✗ {package_name}: Not installed")
-        return False
+        package_version = version(DISTRIBUTION_NAMES.get(package_name, package_name))
+        return package_name, True, f"✓ {package_name}: {package_version}"
+    except PackageNotFoundError:
+        pass
+
+    if importlib.util.find_spec(package_name) is None:
+        return package_name, False, f"✗ {package_name}: Not installed"
+    return package_name, True, f"✓ {package_name}: Unknown version"
 
-def check_cuda():
-    """Check if CUDA is available for PyTorch."""
+CUDA_DRIVER_LIBRARIES = {
+    "Windows": "nvcuda.dll",
+    "Darwin": "libcuda.dylib",
+}
+
+@lru_cache(maxsize=1)
+def _probe_cuda_driver():
+    """Query the CUDA driver directly through ctypes.
+
+    Returns (device_count, device_name), or None if the driver library
+    could not be loaded.
+    """
+    library = CUDA_DRIVER_LIBRARIES.get(platform.system(), "libcuda.so.1")
     try:
-        import torch
-        if torch.cuda.is_available():
-            device_count = torch.cuda.device_count()
-            device_name = torch.cuda.get_device_name(0) if device_count > 0 else "N/A"
-            print(f"✓ CUDA: Available (Devices: {device_count}, Name: {device_name})")
-            return True
-        else:
-            print("✗ CUDA: Not available")
-            print("  Note: CUDA is recommended for faster transcription but not required")
-            return False
+        cuda = ctypes.CDLL(library)
+    except OSError:
+        return None
+
+    # CUDA driver API calls return 0 (CUDA_SUCCESS) on success
+    count = ctypes.c_int()
+    if cuda.cuInit(0) != 0 or cuda.cuDeviceGetCount(ctypes.byref(count)) != 0:
+        return 0, None
+    if count.value == 0:
+        return 0, None
+
+    device = ctypes.c_int()
+    name = ctypes.create_string_buffer(256)
+    if (
+        cuda.cuDeviceGet(ctypes.byref(device), 0) != 0
+        or cuda.cuDeviceGetName(name, len(name), device) != 0
+    ):
+        return count.value, "N/A"
+    return count.value, name.value.decode("utf-8", "replace")
+
+def check_cuda(verify_runtime=False):
+    """Check if CUDA is available for CTranslate2 (used by faster-whisper).
+
+    The CUDA driver is probed first, which takes milliseconds. CTranslate2
+    is only imported to confirm it can use the GPU when verify_runtime is
+    set, or when the driver library cannot be loaded at all.
+    """
+    not_available = (
+        "✗ CUDA: Not available\n"
+        "  Note: CUDA is recommended for faster transcription but not required"
+    )
+
+    probe = _probe_cuda_driver()
+    if probe is not None:
+        device_count, device_name = probe
+        if device_count == 0:
+            return "cuda", False, not_available
+        message = f"✓ CUDA: Available (Devices: {device_count}, Name: {device_name})"
+        if not verify_runtime:
+            return "cuda", True, message
+
+    try:
+        import ctranslate2
+        runtime_device_count = ctranslate2.get_cuda_device_count()
     except ImportError:
-        print("✗ PyTorch: Not installed")
-        return False
+        return "cuda", False, "✗ CTranslate2: Not installed"
+
+    if probe is not None:
+        return "cuda", True, (
+            f"{message}\n  CTranslate2 CUDA devices: {runtime_device_count}"
+        )
+    if runtime_device_count > 0:
+        return "cuda", True, f"✓ CUDA: Available (Devices: {runtime_device_count})"
+    else:
+        return "cuda", False, not_available
+
+PACKAGES_SECTION = "Checking required Python packages:"
+CUDA_SECTION = "Checking CUDA availability:"
+
+# (label, section, check, arg) in the order results are printed, after the
+# Python version check. A callable arg is resolved from the parsed command
+# line arguments
+CHECKS = (
+    ("ffmpeg", None, check_ffmpeg, None),
+    ("ctranslate2", PACKAGES_SECTION, check_package, "ctranslate2"),
+    ("faster_whisper", PACKAGES_SECTION, check_package, "faster_whisper"),
+    ("ffmpeg-python", PACKAGES_SECTION, check_package, "ffmpeg"),
+    ("tqdm", PACKAGES_SECTION, check_package, "tqdm"),
+    ("numpy", PACKAGES_SECTION, check_package, "numpy"),
+    ("cuda", CUDA_SECTION, check_cuda, lambda args: args.verify_runtime),
+)
+REQUIRED_LABELS = (
+    "python",
+    "ffmpeg",
+    "ctranslate2",
+    "faster_whisper",
+    "ffmpeg-python",
+    "tqdm",
+    "numpy",
+)
+# Checks that are only meaningful if another check passed
+CHECK_REQUIRES = {"cuda": "ctranslate2"}
+# Heavy modules imported by check_cuda, warmed up in the background
+PREWARM_MODULES = ("ctranslate2",)
+
+def prewarm_imports(modules):
+    """Import modules so a later import is served from sys.modules."""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass  # Reported by the package checks
+
+def run_check(check, arg):
+    """Call a check with its argument from the CHECKS table, if any."""
+    return check() if arg is None else check(arg)
+
+def run_checks(checks):
+    """Run independent checks in a thread pool and return results in order.
+
+    The checks are dominated by heavy imports and the ffmpeg subprocess,
+    which release the GIL, so the total time is close to the slowest check.
+    """
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(run_check, check, arg) for check, arg in checks]
+        return [future.result() for future in futures]
 
 def main():
     """Run all checks and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--verify-runtime",
+        action="store_true",
+        help="also import CTranslate2 to confirm it can use the CUDA devices",
+    )
+    args = parser.parse_args()
+    checks = [
+        (label, section, check, arg(args) if callable(arg) else arg)
+        for label, section, check, arg in CHECKS
+    ]
+
+    # Overlap the slow CTranslate2 import with the other checks, but only
+    # when check_cuda will import it (set PREWARM=0 to disable)
+    prewarm = None
+    if os.environ.get("PREWARM", "1") == "1" and (
+        args.verify_runtime or _probe_cuda_driver() is None
+    ):
+        prewarm = threading.Thread(
+            target=prewarm_imports, args=(PREWARM_MODULES,), daemon=True
+        )
+        prewarm.start()
+
     print("Testing installation for Video Transcription App")
     print("=" * 50)
     print(f"System: {platform.system()} {platform.release()}")
     print("-" * 50)
-    
-    python_ok = check_python_version()
-    ffmpeg_ok = check_ffmpeg()
-    
-    print("\nChecking required Python packages:")
-    torch_ok = check_package("torch")
-    whisper_ok = check_package("whisper")
-    ffmpeg_python_ok = check_package("ffmpeg")
-    tqdm_ok = check_package("tqdm")
-    numpy_ok = check_package("numpy")
-    
-    print("\nChecking CUDA availability:")
-    cuda_ok = check_cuda()
+
+    # Nothing else is meaningful on an unsupported interpreter
+    _, python_ok, message = check_python_version()
+    print(message)
+    if not python_ok:
+        print("\nPlease upgrade Python first, the remaining checks were skipped.")
+        return 1
+
+    outcomes = {}
+    independent_checks = [c for c in checks if c[0] not in CHECK_REQUIRES]
+    independent_outcomes = run_checks(
+        [(check, arg) for _, _, check, arg in independent_checks]
+    )
+    for (label, _, _, _), outcome in zip(independent_checks, independent_outcomes):
+        outcomes[label] = outcome
+
+    if prewarm is not None:
+        prewarm.join(timeout=10)
+
+    # Dependent checks run afterwards, and only if their requirement passed
+    for label, _, check, arg in checks:
+        if label not in CHECK_REQUIRES:
+            continue
+        required = CHECK_REQUIRES[label]
+        if not outcomes[required][1]:
+            message = f"✗ {label}: Skipped, {required} is not installed"
+            outcomes[label] = (label, False, message)
+        else:
+            outcomes[label] = run_check(check, arg)
+
+    results = {"python": python_ok}
+    section = None
+    for label, check_section, _, _ in checks:
+        _, ok, message = outcomes[label]
+        if check_section != section:
+            section = check_section
+            print(f"\n{section}")
+        print(message)
+        results[label] = ok
     
     print("\nSummary:")
     print("-" * 50)
     
-    required_checks = [python_ok, ffmpeg_ok, torch_ok, whisper_ok, ffmpeg_python_ok, tqdm_ok, numpy_ok]
-    if all(required_checks):
+    required_ok = all(results[label] for label in REQUIRED_LABELS)
+    if required_ok:
         print("✓ All required components are installed correctly!")
     else:
         print("✗ Some required components are missing or not configured correctly.")
         print("  Please check the output above and install missing components.")
     
-    if not cuda_ok:
+    if not results["cuda"]:
         print("\nNote: CUDA is not available. The application will still work but transcription")
         print("      will be slower. For better performance, consider setting up CUDA.")
     
     print("\nIf you need to install missing packages, run:")
     print("pip install -r requirements.txt")
+    return 0 if required_ok else 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file